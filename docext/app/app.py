@@ -212,6 +212,7 @@ def gradio_app(
     vllm_server_host: str,
     vllm_server_port: int,
     max_gen_tokens: int,
+    max_concurrent_pages: int = 3,
 ):
     # set vlm_model_url env variable
     hosted_model_url = f"http://{vllm_server_host}:{vllm_server_port}"
@@ -248,7 +249,11 @@ def gradio_app(
                     """Upload an image or a PDF file and convert it to markdown."""
                 )
                 pdf_to_markdown_ui(
-                    model_name, max_img_size, concurrency_limit, max_gen_tokens
+                    model_name,
+                    max_img_size,
+                    concurrency_limit,
+                    max_gen_tokens,
+                    max_concurrent_pages,
                 )
 
         logger.info(f"Launching gradio app on port {gradio_port}")
@@ -275,6 +280,7 @@ def main(
     share: bool,
     dtype: str,
     max_gen_tokens: int,
+    max_concurrent_pages: int = 3,
 ):
     vllm_server = None
     if model_name.startswith("hosted_vllm/") and (
@@ -340,6 +346,7 @@ def main(
             host,
             port,
             max_gen_tokens,
+            max_concurrent_pages,
         )
     except (KeyboardInterrupt, Exception) as e:
         logger.error(f"Error: {e}")
@@ -365,6 +372,7 @@ def docext_app():
         args.share,
         args.dtype,
         args.max_gen_tokens,
+        args.max_concurrent_pages,
     )
 
 
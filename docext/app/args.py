@@ -80,6 +80,12 @@ def parse_args():
         default=1,
         help="Maximum number of concurrent PDF to markdown conversion requests. Higher values allow more users to process documents simultaneously but require more memory and compute resources.",
     )
+    parser.add_argument(
+        "--max_concurrent_pages",
+        type=int,
+        default=3,
+        help="Maximum number of pages of a single PDF to markdown conversion request sent to the model at the same time. Applies per request, so up to `concurrency_limit * max_concurrent_pages` pages can be in flight.",
+    )
     parser.add_argument(
         "--dtype",
         type=str,
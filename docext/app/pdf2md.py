@@ -2,33 +2,35 @@ from __future__ import annotations
 
 import asyncio
 import re
-import time
-import uuid
 from collections.abc import Generator
 from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from secrets import token_hex
 
 import gradio as gr
 
-from docext.core.pdf2md.pdf2md import convert_to_markdown_stream
+from docext.core.pdf2md.pdf2md import iter_page_updates
 from docext.core.utils import convert_files_to_images
 
 
-def process_tags(content: str) -> str:
-    content = content.replace("<img>", "&lt;img&gt;")
-    content = content.replace("</img>", "&lt;/img&gt;")
-    content = content.replace("<watermark>", "&lt;watermark&gt;")
-    content = content.replace("</watermark>", "&lt;/watermark&gt;")
-    content = content.replace("<page_number>", "&lt;page_number&gt;")
-    content = content.replace("</page_number>", "&lt;/page_number&gt;")
-    content = content.replace("<signature>", "&lt;signature&gt;")
-    content = content.replace("</signature>", "&lt;/signature&gt;")
+_TAG_RE = re.compile(r"</?(?:img|watermark|page_number|signature)>")
+_MAX_TAG_LEN = len("</page_number>")
+
 
-    return content
+def process_tags(content: str) -> str:
+    # escape the semantic tags in a single pass so they render as text
+    return _TAG_RE.sub(
+        lambda match: match.group(0).replace("<", "&lt;").replace(">", "&gt;"),
+        content,
+    )
 
 
 def pdf_to_markdown_ui(
-    model_name: str, max_img_size: int, concurrency_limit: int, max_gen_tokens: int
+    model_name: str,
+    max_img_size: int,
+    concurrency_limit: int,
+    max_gen_tokens: int,
+    max_concurrent_pages: int = 3,
 ):
     with gr.Row():
         with gr.Column():
@@ -101,35 +103,67 @@ We’ve open-sourced Nanonets-OCR-s, A model for transforming documents into str
                 Optimized for concurrent processing of multiple requests
                 """
                 # Generate unique request ID for tracking
-                request_id = str(uuid.uuid4())[:8]
+                request_id = token_hex(4)
                 start_time = datetime.now().strftime("%H:%M:%S")
 
                 # Initialize with a loading message including concurrent processing info
                 num_pages = len(images) if images else 0
 
                 # Stream the actual conversion
-                current_page = 1
+                # escaped markdown of the finished pages, appended once per page
+                completed_pages = ""
+                # escaped text of the current page, only new content is escaped
+                page_parts: list[str] = []
+                page_escaped_len = 0
                 try:
-                    for markdown_content in convert_to_markdown_stream(
+                    for (
+                        page_index,
+                        page_header,
+                        page_content,
+                        page_done,
+                    ) in iter_page_updates(
                         images,
                         model_name,
                         max_img_size,
                         concurrency_limit,
                         max_gen_tokens,
+                        max_concurrent_pages,
                     ):
                         # Add progress indicator at the top for multi-page documents
-                        if num_pages > 1:
-                            progress_header = f"📄 **Document Conversion Progress** `[Request {request_id}]` (Processing page {min(current_page, num_pages)} of {num_pages})\n\n"
-                            yield progress_header + process_tags(markdown_content)
-                        else:
-                            yield process_tags(markdown_content)
-
-                        # Estimate current page based on content length (rough approximation)
-                        if "---" in markdown_content:
-                            current_page = markdown_content.count("---") + 1
-
-                        # Reduced delay for better concurrent performance
-                        time.sleep(0.01)
+                        progress_header = (
+                            f"📄 **Document Conversion Progress** `[Request {request_id}]` (Processing page {min(page_index + 1, num_pages)} of {num_pages})\n\n"
+                            if num_pages > 1
+                            else ""
+                        )
+                        if page_done:
+                            # the final update may replace the streamed text
+                            # (fallback), so escape the whole page once
+                            completed_pages += process_tags(page_header + page_content)
+                            page_parts, page_escaped_len = [], 0
+                            yield progress_header + completed_pages
+                            continue
+
+                        if not page_parts:
+                            page_parts.append(process_tags(page_header))
+                        # hold back a trailing "<" that may be the start of an incomplete tag
+                        cut = page_content.rfind(
+                            "<",
+                            max(page_escaped_len, len(page_content) - _MAX_TAG_LEN + 1),
+                        )
+                        if cut == -1:
+                            cut = len(page_content)
+                        page_parts.append(
+                            process_tags(page_content[page_escaped_len:cut])
+                        )
+                        page_escaped_len = cut
+                        yield "".join(
+                            [
+                                progress_header,
+                                completed_pages,
+                                *page_parts,
+                                process_tags(page_content[cut:]),
+                            ]
+                        )
 
                 except Exception as e:
                     error_message = f"❌ **Error processing request {request_id}**: {str(e)}\n\nPlease try again or contact support if the issue persists."
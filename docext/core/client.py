@@ -46,5 +46,4 @@ def sync_request(
         if any("json" in m.get("text", "").lower() for m in messages if isinstance(m, dict)):
             completion_args["response_format"] = {"type": "json_object"}
 
-    response = completion(**completion_args)
-    return response.json()
+    return completion(**completion_args)
@@ -36,9 +36,11 @@ def extract_fields_from_documents(
     }
 
     logger.info(f"Sending request to {model_name}")
-    response = sync_request(messages, model_name, format=format_fields)["choices"][0][
-        "message"
-    ]["content"]
+    response = (
+        sync_request(messages, model_name, format=format_fields)
+        .choices[0]
+        .message.content
+    )
     logger.info(f"Response: {response}")
 
     # conf score
@@ -56,11 +58,15 @@ def extract_fields_from_documents(
         },
     }
 
-    response_conf_score = sync_request(
-        messages,
-        model_name,
-        format=format_fields_conf_score,
-    )["choices"][0]["message"]["content"]
+    response_conf_score = (
+        sync_request(
+            messages,
+            model_name,
+            format=format_fields_conf_score,
+        )
+        .choices[0]
+        .message.content
+    )
     logger.info(f"Response conf score: {response_conf_score}")
 
     extracted_fields = json_repair.loads(response)
@@ -112,7 +118,7 @@ def extract_tables_from_documents(
     messages = get_tables_messages(columns_names, columns_description, file_paths)
 
     logger.info(f"Sending request to {model_name}")
-    response = sync_request(messages, model_name)["choices"][0]["message"]["content"]
+    response = sync_request(messages, model_name).choices[0].message.content
     logger.info(f"Response: {response}")
 
     response = response[response.index("|") : response.rindex("|") + 1]
@@ -136,7 +142,7 @@ def extract_information(
     ]
     validate_file_paths(file_paths)
     file_paths = convert_files_to_images(file_paths)
-    resize_images(file_paths, max_img_size)
+    file_paths = resize_images(file_paths, max_img_size)
 
     # call fields and tables extraction in parallel
     with ThreadPoolExecutor() as executor:
@@ -5,16 +5,29 @@ import tempfile
 from typing import Optional
 
 from pdf2image import convert_from_path
+from pdf2image import pdfinfo_from_path
 
 from docext.core.file_converters.file_converter import FileConverter
 
 
 class PDFConverter(FileConverter):
+    def __init__(self, batch_size: int = 8):
+        # number of pages rendered at once, bounds memory for large PDFs
+        self.batch_size = batch_size
+
     def convert_to_images(self, file_path: str):
-        return convert_from_path(file_path)
+        return list(self.iter_images(file_path))
+
+    def iter_images(self, file_path: str):
+        num_pages = pdfinfo_from_path(file_path)["Pages"]
+        for first_page in range(1, num_pages + 1, self.batch_size):
+            last_page = min(first_page + self.batch_size - 1, num_pages)
+            yield from convert_from_path(
+                file_path, first_page=first_page, last_page=last_page
+            )
 
     def convert_and_save_images(self, file_path: str, output_folder: str | None = None):
-        images = self.convert_to_images(file_path)
+        images = self.iter_images(file_path)
         if not output_folder:
             # set tmp folder as output folder
             output_folder = tempfile.gettempdir()
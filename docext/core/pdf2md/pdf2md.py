@@ -2,22 +2,85 @@ from __future__ import annotations
 
 import json
 import os
+import queue
+import threading
+from collections import OrderedDict
 from collections.abc import Generator
+from concurrent.futures import Future
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
 import requests
 from loguru import logger
+from requests.adapters import DEFAULT_POOLSIZE
+from requests.adapters import HTTPAdapter
+from tenacity import retry
+from tenacity import retry_if_exception
+from tenacity import stop_after_attempt
+from tenacity import wait_exponential_jitter
 
 from docext.core.utils import convert_files_to_images
 from docext.core.utils import encode_image
+from docext.core.utils import encode_image_and_hash
+from docext.core.utils import get_mime_type
 from docext.core.utils import resize_images
 from docext.core.utils import validate_file_paths
 
 
+@lru_cache(maxsize=None)
+def _get_session(pool_maxsize: int) -> requests.Session:
+    """
+    Shared HTTP session so connections to the VLM server are pooled across
+    pages and requests instead of being re-established on every call.
+    `pool_maxsize` should cover every stream that can be open at once, any
+    connection beyond it is discarded after use instead of kept alive.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_maxsize)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def _is_transient_error(error: BaseException) -> bool:
+    # rate limits, server errors and dropped connections are worth retrying
+    if isinstance(error, requests.HTTPError):
+        return error.response is not None and (
+            error.response.status_code == 429 or error.response.status_code >= 500
+        )
+    return isinstance(error, (requests.ConnectionError, requests.Timeout))
+
+
+@retry(
+    stop=stop_after_attempt(3),
+    wait=wait_exponential_jitter(initial=0.5, max=8),
+    retry=retry_if_exception(_is_transient_error),
+    reraise=True,
+)
+def _open_stream(
+    url: str, payload: dict, headers: dict, pool_maxsize: int
+) -> requests.Response:
+    """
+    Opens the streaming response, retrying transient failures. Only opening is
+    retried; errors after chunks were yielded go to the non-streaming fallback.
+    """
+    response = _get_session(pool_maxsize).post(
+        url, json=payload, headers=headers, stream=True
+    )
+    try:
+        response.raise_for_status()
+    except requests.HTTPError:
+        response.close()
+        raise
+    return response
+
+
 def stream_request(
     messages: list[dict],
     model_name: str,
     max_tokens: int = 8000,
     temperature: float = 0.0,
+    pool_maxsize: int = DEFAULT_POOLSIZE,
 ) -> Generator[str]:
     """
     Make a streaming request to the vLLM server running on localhost:8000
@@ -46,9 +109,7 @@ def stream_request(
     url = f"{vlm_url}/chat/completions"
 
     try:
-        with requests.post(url, json=payload, headers=headers, stream=True) as response:
-            response.raise_for_status()
-
+        with _open_stream(url, payload, headers, pool_maxsize) as response:
             for line in response.iter_lines():
                 if line:
                     line = line.decode("utf-8")
@@ -71,12 +132,147 @@ def stream_request(
         raise
 
 
-def convert_to_markdown_stream(
-    file_inputs, model_name, max_img_size, concurrency_limit, max_gen_tokens
+_PAGE_DONE = object()
+
+# In-process LRU of converted pages keyed by (image sha256, model, max tokens).
+# Generation runs with temperature 0, so the same page gives the same markdown.
+_PAGE_CACHE_MAXSIZE = 256
+_PAGE_CACHE: OrderedDict[tuple[str, str, int], str] = OrderedDict()
+_PAGE_CACHE_LOCK = threading.Lock()
+
+
+def _get_cached_page(key: tuple[str, str, int]) -> str | None:
+    with _PAGE_CACHE_LOCK:
+        if key not in _PAGE_CACHE:
+            return None
+        _PAGE_CACHE.move_to_end(key)
+        return _PAGE_CACHE[key]
+
+
+def _cache_page(key: tuple[str, str, int], page_content: str):
+    with _PAGE_CACHE_LOCK:
+        _PAGE_CACHE[key] = page_content
+        _PAGE_CACHE.move_to_end(key)
+        if len(_PAGE_CACHE) > _PAGE_CACHE_MAXSIZE:
+            _PAGE_CACHE.popitem(last=False)
+
+
+def _get_page_messages(
+    file_path: str, user_prompt: str, encoded_image: str | None = None
+) -> list[dict]:
+    if encoded_image is None:
+        encoded_image = encode_image(file_path)
+    content = [
+        {
+            "type": "image_url",
+            "image_url": {
+                "url": f"data:{get_mime_type(file_path)};base64,{encoded_image}"
+            },
+        },
+        {"type": "text", "text": user_prompt},
+    ]
+    return [{"role": "user", "content": content}]
+
+
+class _ImagePrefetcher:
+    """
+    Encodes page images ahead of the page workers. With `lookahead` pages
+    streaming at once, the pages they will pick up next are encoded while the
+    current requests are in flight, so a worker starts its next request without
+    first reading and encoding the image. Encodes run on `lookahead` threads,
+    and at most `2 * lookahead` encoded pages are held at once.
+    """
+
+    def __init__(self, file_paths: list[str], lookahead: int):
+        self._file_paths = file_paths
+        self._lookahead = lookahead
+        self._executor = ThreadPoolExecutor(max_workers=lookahead)
+        self._futures: dict[int, Future] = {}
+        self._next_index = 0
+        self._lock = threading.Lock()
+
+    def _submit_until(self, index: int):
+        while self._next_index <= min(index, len(self._file_paths) - 1):
+            self._futures[self._next_index] = self._executor.submit(
+                encode_image_and_hash, self._file_paths[self._next_index]
+            )
+            self._next_index += 1
+
+    def get(self, index: int) -> tuple[str, str]:
+        """Returns `(encoded_image, digest)` of the page at `index`."""
+        with self._lock:
+            self._submit_until(index + self._lookahead)
+            future = self._futures.pop(index)
+        return future.result()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _stream_page_to_queue(
+    file_path: str,
+    page_index: int,
+    prefetcher: _ImagePrefetcher,
+    user_prompt: str,
+    model_name: str,
+    max_tokens: int,
+    pool_maxsize: int,
+    page_queue: queue.Queue,
 ):
     """
-    Generator function that yields streaming markdown conversion results
-    Processes images one by one and concatenates results
+    Worker that streams a single page and pushes the chunks to `page_queue`.
+    Exceptions are pushed to the queue so the consumer can fall back.
+    Pages already converted with the same model are served from the cache.
+    """
+    try:
+        encoded_image, digest = prefetcher.get(page_index)
+        cache_key = (digest, model_name, max_tokens)
+        cached_page = _get_cached_page(cache_key)
+        if cached_page is not None:
+            logger.info(f"Using cached markdown for {file_path}")
+            page_queue.put(cached_page)
+            return
+
+        page_chunks = []
+        for chunk in stream_request(
+            messages=_get_page_messages(file_path, user_prompt, encoded_image),
+            model_name=model_name,
+            max_tokens=max_tokens,
+            pool_maxsize=pool_maxsize,
+        ):
+            page_chunks.append(chunk)
+            page_queue.put(chunk)
+        _cache_page(cache_key, "".join(page_chunks))
+    except Exception as e:
+        page_queue.put(e)
+    finally:
+        page_queue.put(_PAGE_DONE)
+
+
+def _iter_page_queue(page_queue: queue.Queue) -> Generator[str]:
+    while True:
+        item = page_queue.get()
+        if item is _PAGE_DONE:
+            return
+        if isinstance(item, Exception):
+            raise item
+        yield item
+
+
+def iter_page_updates(
+    file_inputs,
+    model_name,
+    max_img_size,
+    concurrency_limit,
+    max_gen_tokens,
+    max_concurrent_pages: int = 3,
+) -> Generator[tuple[int, str, str, bool]]:
+    """
+    Yields `(page_index, page_header, page_content, page_done)` for every
+    streamed update of every page, in page order. `page_content` is the content
+    of the current page so far and only grows between updates of a page; the
+    final update has `page_done` set and may replace the streamed content
+    (e.g. after a fallback to a non-streaming request).
     """
     file_paths: list[str] = [
         file_input[0] if isinstance(file_input, tuple) else file_input
@@ -84,98 +280,161 @@ def convert_to_markdown_stream(
     ]
     validate_file_paths(file_paths)
     file_paths = convert_files_to_images(file_paths)
-    resize_images(file_paths, max_img_size)
+    file_paths = resize_images(file_paths, max_img_size)
 
     # Create system prompt for PDF to markdown conversion
     user_prompt = """Extract the text from the above document as if you were reading it naturally. Return the tables in html format. Watermarks should be wrapped in brackets. Ex: <watermark>OFFICIAL COPY</watermark>. Page numbers should be wrapped in brackets. Ex: <page_number>14</page_number> or <page_number>9/22</page_number>. Prefer using ☐ and ☑ for check boxes."""
 
     logger.info(
-        f"Converting {len(file_paths)} image(s) to markdown using {model_name} (processing one by one)"
+        f"Converting {len(file_paths)} image(s) to markdown using {model_name} "
+        f"({max(max_concurrent_pages, 1)} page(s) in flight)"
     )
 
-    # Accumulate results from all pages
-    full_markdown_content = ""
-
-    # Process each image individually
+    # Pages are requested concurrently (bounded by `max_concurrent_pages`) and
+    # buffered in per-page queues, but yielded strictly in page order.
+    executor = ThreadPoolExecutor(max_workers=max(max_concurrent_pages, 1))
+    # every concurrent request (up to `concurrency_limit`) can have this many
+    # pages streaming, so size the shared connection pool for all of them
+    pool_maxsize = max(
+        max(concurrency_limit, 1) * max(max_concurrent_pages, 1), DEFAULT_POOLSIZE
+    )
+    prefetcher = _ImagePrefetcher(file_paths, max(max_concurrent_pages, 1))
+    page_queues: list[queue.Queue] = []
     for i, file_path in enumerate(file_paths):
-        logger.info(f"Processing page {i + 1} of {len(file_paths)}: {file_path}")
-
-        # Build messages for this single image
-        content = [
-            {
-                "type": "image_url",
-                "image_url": {
-                    "url": f"data:image/jpeg;base64,{encode_image(file_path)}"
-                },
-            },
-            {"type": "text", "text": user_prompt},
-        ]
-
-        messages = [{"role": "user", "content": content}]
-
-        # Stream this individual page
-        page_content = ""
-        try:
-            for chunk in stream_request(
-                messages=messages,
-                model_name=model_name,
-                max_tokens=max_gen_tokens,
-            ):
-                page_content += chunk
-                # Yield accumulated content from all pages processed so far + current page
-                current_total = (
-                    full_markdown_content
-                    + f"Page {i + 1} of {len(file_paths)}\n"
-                    + page_content
-                )
-                yield current_total
-
-            # Process the completed page content and add it to the full content
-            full_markdown_content += (
-                f"Page {i + 1} of {len(file_paths)}\n" + page_content
-            )
-            logger.info(f"Successfully converted page {i + 1}")
+        page_queue: queue.Queue = queue.Queue()
+        executor.submit(
+            _stream_page_to_queue,
+            file_path,
+            i,
+            prefetcher,
+            user_prompt,
+            model_name,
+            max_gen_tokens,
+            pool_maxsize,
+            page_queue,
+        )
+        page_queues.append(page_queue)
 
-        except Exception as e:
-            logger.error(f"Error during streaming conversion of page {i + 1}: {e}")
-            # Fallback to non-streaming for this page
-            logger.info(f"Falling back to non-streaming request for page {i + 1}")
+    try:
+        for i, (file_path, page_queue) in enumerate(zip(file_paths, page_queues)):
+            logger.info(f"Processing page {i + 1} of {len(file_paths)}: {file_path}")
+
+            # Stream this individual page
+            page_header = f"Page {i + 1} of {len(file_paths)}\n"
+            page_content = ""
             try:
-                from docext.core.client import sync_request
-
-                response = sync_request(
-                    messages=messages, model_name=model_name, max_tokens=max_gen_tokens
-                )
-                page_content = response["choices"][0]["message"]["content"]
-                full_markdown_content += (
-                    f"Page {i + 1} of {len(file_paths)}\n" + page_content
-                )
-                yield full_markdown_content
-            except Exception as fallback_error:
-                logger.error(f"Fallback also failed for page {i + 1}: {fallback_error}")
-                error_content = (
-                    f"\n\n**Error processing page {i + 1}: {str(fallback_error)}**\n\n"
-                )
-                full_markdown_content += (
-                    f"Page {i + 1} of {len(file_paths)}\n" + error_content
-                )
-                yield full_markdown_content
+                for chunk in _iter_page_queue(page_queue):
+                    page_content += chunk
+                    yield i, page_header, page_content, False
+
+                yield i, page_header, page_content, True
+                logger.info(f"Successfully converted page {i + 1}")
+
+            except Exception as e:
+                logger.error(f"Error during streaming conversion of page {i + 1}: {e}")
+                # Fallback to non-streaming for this page
+                logger.info(f"Falling back to non-streaming request for page {i + 1}")
+                try:
+                    from docext.core.client import sync_request
+
+                    response = sync_request(
+                        messages=_get_page_messages(file_path, user_prompt),
+                        model_name=model_name,
+                        max_tokens=max_gen_tokens,
+                    )
+                    page_content = response.choices[0].message.content
+                    yield i, page_header, page_content, True
+                except Exception as fallback_error:
+                    logger.error(
+                        f"Fallback also failed for page {i + 1}: {fallback_error}"
+                    )
+                    error_content = f"\n\n**Error processing page {i + 1}: {str(fallback_error)}**\n\n"
+                    yield i, page_header, error_content, True
+    finally:
+        # Don't start pending pages if the consumer went away early
+        executor.shutdown(wait=False, cancel_futures=True)
+        prefetcher.shutdown()
+
+    logger.info("Successfully completed document conversion")
+
+
+def convert_to_markdown_stream(
+    file_inputs,
+    model_name,
+    max_img_size,
+    concurrency_limit,
+    max_gen_tokens,
+    max_concurrent_pages: int = 3,
+):
+    """
+    Generator function that yields streaming markdown conversion results
+    Processes images concurrently and concatenates results in page order
+    """
+    # Accumulate results from all pages
+    full_markdown_content = ""
+
+    for _, page_header, page_content, page_done in iter_page_updates(
+        file_inputs,
+        model_name,
+        max_img_size,
+        concurrency_limit,
+        max_gen_tokens,
+        max_concurrent_pages,
+    ):
+        if page_done:
+            # Add the completed page content to the full content
+            full_markdown_content += page_header + page_content
+            yield full_markdown_content
+        else:
+            # Yield accumulated content from all pages processed so far + current page
+            yield "".join((full_markdown_content, page_header, page_content))
 
     # print raw model response
     logger.info(f"Raw model response:\n {full_markdown_content}")
-    logger.info("Successfully completed document conversion")
+
+
+def iter_markdown_pages(
+    file_inputs,
+    model_name,
+    max_img_size,
+    concurrency_limit,
+    max_gen_tokens,
+    max_concurrent_pages: int = 3,
+) -> Generator[str]:
+    """
+    Yields the markdown of each page as soon as the page is complete
+    """
+    for _, page_header, page_content, page_done in iter_page_updates(
+        file_inputs,
+        model_name,
+        max_img_size,
+        concurrency_limit,
+        max_gen_tokens,
+        max_concurrent_pages,
+    ):
+        if page_done:
+            yield page_header + page_content
 
 
 def convert_to_markdown(
-    file_inputs, model_name, max_img_size, concurrency_limit, max_gen_tokens
+    file_inputs,
+    model_name,
+    max_img_size,
+    concurrency_limit,
+    max_gen_tokens,
+    max_concurrent_pages: int = 3,
 ):
     """
     Non-streaming version for backward compatibility
     """
-    # Get the final result from the streaming generator
-    final_result = ""
-    for result in convert_to_markdown_stream(
-        file_inputs, model_name, max_img_size, concurrency_limit, max_gen_tokens
-    ):
-        final_result = result
-    return final_result
+    # Join the completed pages instead of rebuilding the document on every chunk
+    return "".join(
+        iter_markdown_pages(
+            file_inputs,
+            model_name,
+            max_img_size,
+            concurrency_limit,
+            max_gen_tokens,
+            max_concurrent_pages,
+        )
+    )
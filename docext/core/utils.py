@@ -1,18 +1,53 @@
 from __future__ import annotations
 
-import base64
+import hashlib
 import io
+import mimetypes
 import os
+from functools import lru_cache
 from typing import Union
 
 import pandas as pd
+import pybase64
 from PIL import Image
 from docext.core.file_converters.pdf_converter import PDFConverter
 
 
-def encode_image(image_path):
+_SUPPORTED_IMAGE_EXTENSIONS = (
+    ".jpg",
+    ".jpeg",
+    ".png",
+    ".tiff",
+    ".bmp",
+    ".gif",
+    ".webp",
+)
+
+_MIME_BY_EXT = {
+    ".pdf": "application/pdf",
+    ".png": "image/png",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".webp": "image/webp",
+    ".gif": "image/gif",
+    ".bmp": "image/bmp",
+    ".tiff": "image/tiff",
+}
+
+
+def encode_image_and_hash(image_path) -> tuple[str, str]:
+    """Return the base64 encoding and the sha256 hex digest of the file."""
+    # encode straight to `str`, peak memory is the raw bytes plus the result
     with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+        image_bytes = image_file.read()
+    return (
+        pybase64.b64encode_as_string(image_bytes),
+        hashlib.sha256(image_bytes).hexdigest(),
+    )
+
+
+def encode_image(image_path):
+    return encode_image_and_hash(image_path)[0]
 
 
 def validate_fields_and_tables(fields_and_tables: dict | pd.DataFrame):
@@ -46,11 +81,38 @@ def validate_fields_and_tables(fields_and_tables: dict | pd.DataFrame):
     return fields_and_tables
 
 
-def resize_images(file_paths: list[str], max_img_size: int):
+def resize_images(file_paths: list[str], max_img_size: int) -> list[str]:
+    """
+    Saves a resized copy next to every image and returns the copies' paths.
+    The source images are left untouched so they can be resized again at any size.
+    """
+    resized_file_paths = []
     for file_path in file_paths:
-        img = Image.open(file_path)
-        img = img.resize((max_img_size, max_img_size))
-        img.save(file_path)
+        root, ext = os.path.splitext(file_path)
+        resized_file_path = f"{root}_{max_img_size}{ext}"
+        # the copy is stamped with the source's mtime; reuse it only while they
+        # still match, so re-submitted pages keep identical bytes
+        source_stat = os.stat(file_path)
+        if (
+            not os.path.exists(resized_file_path)
+            or os.stat(resized_file_path).st_mtime_ns != source_stat.st_mtime_ns
+        ):
+            img = Image.open(file_path)
+            img = img.resize((max_img_size, max_img_size))
+            img.save(resized_file_path)
+            os.utime(
+                resized_file_path,
+                ns=(source_stat.st_atime_ns, source_stat.st_mtime_ns),
+            )
+        resized_file_paths.append(resized_file_path)
+    return resized_file_paths
+
+
+def get_mime_type(file_path: str) -> str:
+    mime_type = _MIME_BY_EXT.get(os.path.splitext(file_path)[1].lower())
+    if mime_type is None:
+        mime_type = mimetypes.guess_type(file_path)[0] or "application/octet-stream"
+    return mime_type
 
 
 def validate_file_paths(file_paths: list[str]):
@@ -59,37 +121,35 @@ def validate_file_paths(file_paths: list[str]):
         assert os.path.exists(file_path), f"File {file_path} does not exist"
         assert os.path.isfile(file_path), f"File {file_path} is not a file"
         assert os.path.splitext(file_path)[1].lower() in [
-            ".jpg",
-            ".jpeg",
-            ".png",
-            ".tiff",
-            ".bmp",
-            ".gif",
-            ".webp",
+            *_SUPPORTED_IMAGE_EXTENSIONS,
             ".pdf",
         ], f"File {file_path} is not an image"
 
 def file_is_supported_image(file_path: str) -> bool:
-    return os.path.splitext(file_path)[1].lower() in [
-        ".jpg",
-        ".jpeg",
-        ".png",
-        ".tiff",
-        ".bmp",
-        ".gif",
-        ".webp",
-    ]
+    return os.path.splitext(file_path)[1].lower() in _SUPPORTED_IMAGE_EXTENSIONS
+
+
+@lru_cache(maxsize=128)
+def _convert_pdf_to_images(file_path: str, mtime: float) -> tuple[str, ...]:
+    # `mtime` is only part of the cache key, so an edited PDF is rendered again
+    image_paths = []
+    for i, image in enumerate(PDFConverter().iter_images(file_path)):
+        image.save(f"{file_path.replace('.pdf', '')}_{i}.jpg")
+        image_paths.append(f"{file_path.replace('.pdf', '')}_{i}.jpg")
+    return tuple(image_paths)
+
 
 # TODO: add support for other file types; only support pdf for now
 def convert_files_to_images(file_paths: list[str]):
     converted_file_paths = []
-    pdf_converter = PDFConverter()
     for file_path in file_paths:
         if os.path.splitext(file_path)[1].lower() == ".pdf":
-            images = pdf_converter.convert_to_images(file_path)
-            for i, image in enumerate(images):
-                image.save(f"{file_path.replace('.pdf', '')}_{i}.jpg")
-                converted_file_paths.append(f"{file_path.replace('.pdf', '')}_{i}.jpg")
+            mtime = os.path.getmtime(file_path)
+            image_paths = _convert_pdf_to_images(file_path, mtime)
+            if not all(os.path.exists(path) for path in image_paths):
+                # rendered pages were removed, render them again
+                image_paths = _convert_pdf_to_images.__wrapped__(file_path, mtime)
+            converted_file_paths.extend(image_paths)
         else:
             if file_is_supported_image(file_path):
                 converted_file_paths.append(file_path)